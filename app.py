@@ -1,10 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
-from utils.preprocessing import load_and_preprocess_data
+from utils.preprocessing import load_and_preprocess_data, build_cube, load_cube, is_up_to_date, save_parquet, cube_path, CUBE_COLUMNS
+from utils.agg_numba import state_sum_count, year_month_counts, year_sums
 
 # Configuration de la page
 st.set_page_config(
@@ -33,6 +32,12 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Graphiques de synthèse sans interaction (pas de survol, zoom ni barre d'outils)
+STATIC_PLOT_CONFIG = {'staticPlot': True, 'displayModeBar': False}
+
+# Couleur fixe par saison, quel que soit l'ordre ou le nombre de saisons affichées
+SEASON_COLORS = {'Winter': '#66B2FF', 'Spring': '#99FF99', 'Summer': '#FFCC99', 'Fall': '#FF9999'}
+
 # Titre principal
 st.title("**Analyse des feux de forêts aux USA**")
 st.info("L'analyse est effectuée sur un échantillon de données filtrées pour le fonctionnement du dashboard")
@@ -42,10 +47,571 @@ def load_cached_data():
     """Fonction pour charger les données avec cache"""
     return load_and_preprocess_data()
 
-# Chargement des données
-df, code_to_name, name_to_code = load_cached_data()
+@st.cache_data
+def load_filter_options():
+    """Valeurs proposées dans les filtres, lues dans les catégories du cube (déjà triées et uniques)"""
+    cube = load_cached_cube()
+    return {
+        col: cube.index.get_level_values(col).categories.tolist()
+        for col in ['FIRE_YEAR', 'STATE_NAME', 'DISCOVERY_SEASON']
+        if col in cube.index.names
+    }
+
+@st.cache_data
+def get_schema():
+    """Colonnes et types des données, fixés dès le chargement"""
+    df, _, _ = load_cached_data()
+    return list(df.columns), dict(df.dtypes.astype(str))
+
+@st.cache_data
+def load_cached_cube():
+    """Fonction pour charger (ou à défaut construire) le cube pré-agrégé avec cache"""
+    if is_up_to_date(cube_path, CUBE_COLUMNS):
+        return load_cube()
+    df, _, _ = load_cached_data()
+    cube = build_cube(df)
+    save_parquet(cube.reset_index(), cube_path)
+    return cube
+
+@st.cache_resource
+def load_year_offsets():
+    """Première ligne de chaque année dans les données triées par FIRE_YEAR (None si non triées)"""
+    df, _, _ = load_cached_data()
+    codes = df['FIRE_YEAR'].array.codes
+    if np.any(np.diff(codes) < 0):
+        return None
+    return np.searchsorted(codes, np.arange(len(df['FIRE_YEAR'].cat.categories) + 1))
+
+@st.cache_resource
+def load_cube_arrays():
+    """Tableaux du cube indépendants des filtres, extraits une seule fois (lecture seule)"""
+    cube = load_cached_cube()
+    levels = {col: cube.index.get_level_values(col).values for col in cube.index.names}
+
+    # Indice du mois (0-11, -1 si inconnu) pour la heatmap
+    months = levels['MONTH'].to_numpy(dtype=float)
+    month_idx = np.where(np.isnan(months), 0, months).astype(np.int64) - 1
+
+    # Nom complet de chaque code d'état
+    state_values = levels['STATE']
+    state_names = levels['STATE_NAME'].to_numpy()
+    known = state_values.codes >= 0
+    name_of_state = np.empty(len(state_values.categories), dtype=object)
+    name_of_state[state_values.codes[known]] = state_names[known]
+
+    return {
+        'levels': levels,
+        'counts': cube['count'].to_numpy(),
+        'sizes': cube['sum_size'].to_numpy(),
+        'n_sizes': cube['n_size'].to_numpy(),
+        'durations': cube['sum_duration'].to_numpy(),
+        'n_durations': cube['n_duration'].to_numpy(),
+        'month_idx': month_idx,
+        'name_of_state': name_of_state,
+        'total_fires': int(cube['count'].sum())
+    }
+
+def selection_mask(columns, selections):
+    """Combine les filtres en un seul masque booléen évalué sur les codes des catégories"""
+    mask = np.ones(len(next(iter(columns.values()))), dtype=bool)
+    for col, selected in selections.items():
+        if selected:
+            values = columns[col]
+            mask &= np.isin(values.codes, values.categories.get_indexer(list(selected)))
+    return mask
+
+def category_counts(values, weights, mask):
+    """Nombre d'incendies par catégorie présente dans la sélection, via np.bincount sur les codes"""
+    known = mask & (values.codes >= 0)
+    counts = np.bincount(values.codes[known], weights=weights[known], minlength=len(values.categories))
+    counts = pd.Series(counts.astype(np.int64), index=values.categories)
+    return counts[counts > 0]
+
+def top_counts(counts, k):
+    """Les k catégories les plus fréquentes, sélectionnées par np.argpartition puis seules triées"""
+    if len(counts) > k:
+        counts = counts.iloc[np.argpartition(-counts.to_numpy(), k - 1)[:k]]
+    return counts.sort_values(ascending=False)
+
+@st.cache_data
+def compute_aggregates(years_key, states_key, seasons_key):
+    """Calcule à partir du cube tous les agrégats affichés par les pages"""
+    arrays = load_cube_arrays()
+    levels = arrays['levels']
+
+    mask = selection_mask(levels, {
+        'FIRE_YEAR': years_key,
+        'STATE_NAME': states_key,
+        'DISCOVERY_SEASON': seasons_key
+    })
+
+    # Colonnes du cube en tableaux NumPy : la sélection reste un masque, le cube n'est pas copié
+    counts = arrays['counts']
+    sizes = arrays['sizes']
+    n_sizes = arrays['n_sizes']
+    durations = arrays['durations']
+    n_durations = arrays['n_durations']
+
+    aggregates = {}
+
+    # Statistiques annuelles : les cinq sommes en une seule passe compilée (Numba) sur les codes des années
+    year_values = levels['FIRE_YEAR']
+    n_years = len(year_values.categories)
+    year_count, year_size, year_n_size, year_duration, year_n_duration = year_sums(
+        year_values.codes,
+        counts,
+        sizes,
+        n_sizes,
+        durations,
+        n_durations,
+        mask,
+        n_years
+    )
+    observed_years = year_count > 0
+    # Colonnes NumPy passées telles quelles aux traces, sans DataFrame intermédiaire
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aggregates['yearly_stats'] = {
+            'FIRE_YEAR': year_values.categories.to_numpy()[observed_years],
+            'count': year_count[observed_years].astype(np.int64),
+            'mean_dur': (year_duration / year_n_duration)[observed_years],
+            'mean_sz': (year_size / year_n_size)[observed_years],
+            'sum_sz': year_size[observed_years]
+        }
+
+    # KPIs de la sélection
+    total_count = year_count.sum()
+    total_n_size = year_n_size.sum()
+    total_n_duration = year_n_duration.sum()
+    aggregates['kpis'] = {
+        'total_fires': int(total_count),
+        'avg_duration': year_duration.sum() / total_n_duration if total_n_duration else float('nan'),
+        'total_area': float(year_size.sum()),
+        'avg_size': year_size.sum() / total_n_size if total_n_size else float('nan')
+    }
+
+    aggregates['seasonal_counts'] = category_counts(
+        levels['DISCOVERY_SEASON'], counts, mask
+    ).sort_values(ascending=False)
+    aggregates['monthly_counts'] = category_counts(
+        levels['MONTH'], counts, mask
+    )
+
+    # Agrégation par état compilée (Numba) sur les codes du cube
+    state_values = levels['STATE']
+    n_states = len(state_values.categories)
+    state_count, state_size = state_sum_count(
+        state_values.codes,
+        counts,
+        sizes,
+        mask,
+        n_states
+    )
+    name_of_state = arrays['name_of_state']
+    observed_states = state_count > 0
+    state_agg = pd.DataFrame({
+        'STATE': state_values.categories[observed_states],
+        'STATE_NAME': name_of_state[observed_states],
+        'COUNT': state_count[observed_states],
+        'TOTAL_SIZE': state_size[observed_states]
+    })
+    state_agg['AVG_SIZE'] = state_agg['TOTAL_SIZE'] / state_agg['COUNT']
+    aggregates['state_agg'] = state_agg
+
+    aggregates['cause_counts'] = top_counts(
+        category_counts(levels['STAT_CAUSE_DESCR'], counts, mask), 8
+    )
+
+    # Heatmap mois vs années, accumulée en parallèle (Numba) sur les codes du cube
+    heatmap = year_month_counts(
+        year_values.codes,
+        arrays['month_idx'],
+        counts,
+        mask,
+        n_years
+    )
+    heatmap_years = heatmap.any(axis=1)
+    aggregates['heatmap'] = pd.DataFrame(
+        heatmap[heatmap_years],
+        index=pd.Index(year_values.categories[heatmap_years], name='FIRE_YEAR'),
+        columns=pd.Index(range(1, 13), name='MONTH')
+    )
+
+    return aggregates
+
+@st.cache_resource
+def make_choropleth(kind):
+    """Construit une seule fois la carte choroplèthe vide, seules les valeurs changent ensuite"""
+    import plotly.express as px
+
+    if kind == 'count':
+        color, scale, title, label = 'COUNT', 'Reds', "Nombre d'incendies par État", "Nombre d'incendies"
+    else:
+        color, scale, title, label = 'TOTAL_SIZE', 'Oranges', "Surface brûlée par État (km²)", "Surface (km²)"
+
+    empty_states = pd.DataFrame({'STATE': [], 'STATE_NAME': [], color: pd.Series(dtype=float)})
+    return px.choropleth(
+        empty_states,
+        locations="STATE",
+        locationmode="USA-states",
+        color=color,
+        scope="usa",
+        color_continuous_scale=scale,
+        title=title,
+        labels={color: label},
+        hover_name="STATE_NAME"
+    )
+
+@st.cache_resource
+def make_yearly_plotter():
+    """Prépare une seule fois les parties fixes du graphique annuel, renvoie la fonction qui y ajoute les données"""
+    # Graphique 2x2 construit en un seul appel : chaque trace vise ses axes
+    panels = [
+        ('count', 'Nb incendies', "Nombre d'incendies", 'red'),
+        ('mean_dur', 'Durée moyenne', 'Durée moyenne (jours)', 'blue'),
+        ('mean_sz', 'Taille moyenne (km²)', 'Taille moyenne (km²)', 'green'),
+        ('sum_sz', 'Surface totale (km²)', 'Surface totale (km²)', 'orange'),
+    ]
+    trace_templates = []
+    subplot_titles = []
+    for i, (column, name, title, color) in enumerate(panels, start=1):
+        axis = '' if i == 1 else str(i)
+        # Traces et mise en page en simples dictionnaires : validées une seule fois par go.Figure
+        trace_templates.append((column, dict(
+            type='scattergl',
+            mode='lines+markers',
+            name=name,
+            line=dict(color=color, width=3),
+            xaxis=f'x{axis}',
+            yaxis=f'y{axis}'
+        )))
+        # Titre de sous-graphique positionné au-dessus de son domaine
+        subplot_titles.append(dict(
+            text=title, showarrow=False, font=dict(size=16),
+            xref=f'x{axis} domain', yref=f'y{axis} domain',
+            x=0.5, y=1.0, xanchor='center', yanchor='bottom'
+        ))
+    layout = dict(
+        grid=dict(rows=2, columns=2, pattern='independent'),
+        annotations=subplot_titles,
+        height=700,
+        title_text="Tendances Annuelles"
+    )
+
+    def plot_yearly(yearly_stats):
+        years = yearly_stats['FIRE_YEAR']
+        return go.Figure(
+            data=[dict(template, x=years, y=yearly_stats[column]) for column, template in trace_templates],
+            layout=layout
+        )
+
+    return plot_yearly
+
+@st.cache_resource(max_entries=32)
+def make_yearly_figure(selection_key, _yearly_stats):
+    """Figure des tendances annuelles construite une fois par sélection (partagée, non modifiée ensuite)"""
+    # Seule la sélection sert de clé : les statistiques viennent des agrégats déjà calculés
+    return make_yearly_plotter()(_yearly_stats)
+
+# PAGE 1: APERÇU DES DONNÉES
+@st.fragment
+def page_overview(selections, aggregates):
+    """Page 1 : aperçu des données"""
+    st.header("Aperçu des Données")
+
+    # KPIs principaux, lus dans les agrégats du cube
+    kpis = aggregates['kpis']
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric(
+            label="Total Incendies",
+            value=f"{kpis['total_fires']:,}",
+            delta=None
+        )
+
+    with col2:
+        avg_duration = kpis['avg_duration']
+        st.metric(
+            label="Durée Moyenne",
+            value=f"{avg_duration:.1f} jours" if pd.notna(avg_duration) else "N/A"
+        )
+
+    with col3:
+        total_area_km2 = kpis['total_area']
+        st.metric(
+            label="Surface Totale",
+            value=f"{total_area_km2:.2f} km²" if total_area_km2 > 0 else "N/A"
+        )
+
+    with col4:
+        avg_size_km2 = kpis['avg_size']
+        st.metric(
+            label="Taille Moyenne",
+            value=f"{avg_size_km2:.2f} km²" if avg_size_km2 > 0 else "N/A"
+        )
+
+    st.markdown("---")
+
+    # Tableau de données
+    st.subheader("Données Brutes")
+
+    # Options d'affichage
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        nb_rows = st.selectbox("Nombre de lignes :", [10, 25, 50, 100])
+
+    # Données ligne à ligne chargées uniquement pour cet aperçu ;
+    # seules les premières lignes sélectionnées sont extraites
+    df, _, _ = load_cached_data()
+
+    # Années contiguës : le filtre se limite à leur plage de lignes
+    lo, hi = 0, len(df)
+    year_offsets = load_year_offsets()
+    if year_offsets is not None and selections['FIRE_YEAR']:
+        year_codes = np.sort(df['FIRE_YEAR'].cat.categories.get_indexer(list(selections['FIRE_YEAR'])))
+        if year_codes[-1] - year_codes[0] + 1 == len(year_codes):
+            lo, hi = year_offsets[year_codes[0]], year_offsets[year_codes[-1] + 1]
+
+    mask = selection_mask({col: df[col].array[lo:hi] for col in selections}, selections)
+    preview_rows = lo + np.flatnonzero(mask)[:nb_rows]
+    st.dataframe(df.iloc[preview_rows], use_container_width=True)
+
+    # Informations techniques
+    st.subheader("Informations Techniques")
+
+    columns, dtypes = get_schema()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Colonnes disponibles :**")
+        st.write(columns)
+
+    with col2:
+        st.write("**Types de données :**")
+        st.write(dtypes)
+
+
+# PAGE 2: ANALYSE TEMPORELLE
+@st.fragment
+def page_temporal(selections, aggregates):
+    """Page 2 : analyse temporelle"""
+    # plotly.express n'est importé qu'à l'affichage d'une page avec graphiques
+    import plotly.express as px
+
+    st.header("Analyse Temporelle")
+
+    # Évolution annuelle
+    st.subheader("Évolution Annuelle")
+
+    st.plotly_chart(
+        make_yearly_figure(tuple(selections.values()), aggregates['yearly_stats']),
+        use_container_width=True
+    )
+
+    # Analyse saisonnière
+    st.subheader("Analyse Saisonnière")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        seasonal_stats = aggregates['seasonal_counts']
+        fig_pie = px.pie(
+            values=seasonal_stats.values,
+            names=seasonal_stats.index,
+            title="Répartition par Saison",
+            color_discrete_sequence=[SEASON_COLORS[season] for season in seasonal_stats.index]
+        )
+        st.plotly_chart(fig_pie, use_container_width=True, config=STATIC_PLOT_CONFIG)
+
+    with col2:
+        fig_bar = px.bar(
+            x=seasonal_stats.index,
+            y=seasonal_stats.values,
+            title="Nombre d'incendies par saison",
+            color=seasonal_stats.values,
+            color_continuous_scale='Reds'
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
 
-if not df.empty:
+    # Analyse mensuelle
+    st.subheader("Analyse Mensuelle")
+
+    monthly_stats = aggregates['monthly_counts']
+
+    fig_line = px.line(
+        x=monthly_stats.index,
+        y=monthly_stats.values,
+        title="Evolution mensuelle des incendies",
+        markers=True,
+        render_mode='webgl'
+    )
+    fig_line.update_traces(line_color='orange', line_width=3)
+    fig_line.update_layout(xaxis_title="Mois", yaxis_title="Nombre d'incendies")
+    st.plotly_chart(fig_line, use_container_width=True)
+
+
+# PAGE 3: VISUALISATIONS BI
+@st.fragment
+def page_bi(aggregates):
+    """Page 3 : visualisations BI"""
+    import plotly.express as px
+
+    st.header("Visualisations Business Intelligence")
+    
+    # Analyse par États
+    st.subheader("Analyse Géographique")
+
+    # TOUS les états pour les cartes
+    all_states = aggregates['state_agg']
+            
+    # TOP 10 pour les graphiques en barres
+    state_stats = all_states.nlargest(10, 'COUNT')
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig_states = px.bar(
+            state_stats,
+            x='COUNT',
+            y='STATE_NAME',
+            orientation='h',
+            title="Top 10 États - Nombre d'incendies",
+            color='COUNT',
+            color_continuous_scale='Reds'
+        )
+        st.plotly_chart(fig_states, use_container_width=True)
+
+    state_stats = all_states.nlargest(10, 'TOTAL_SIZE')
+    with col2:
+        fig_size = px.bar(
+            state_stats,
+            x='TOTAL_SIZE',
+            y='STATE_NAME',
+            orientation='h',
+            title="Surface brûlée par État (km²)",
+            color='TOTAL_SIZE',
+            color_continuous_scale='Oranges'
+        )
+        fig_size.update_layout(xaxis_title="Surface totale (km²)")
+        st.plotly_chart(fig_size, use_container_width=True)
+
+    # Carte choroplèthe avec TOUS les états
+    st.subheader("Cartes des incendies par État")
+            
+    col3, col4 = st.columns(2)
+            
+    with col3:
+        fig_map_count = go.Figure(make_choropleth('count'))
+        fig_map_count.update_traces(
+            z=all_states['COUNT'].to_numpy(),
+            locations=all_states['STATE'].to_numpy(),
+            hovertext=all_states['STATE_NAME'].to_numpy()
+        )
+        st.plotly_chart(fig_map_count, use_container_width=True)
+
+    with col4:
+        fig_map_size = go.Figure(make_choropleth('size'))
+        fig_map_size.update_traces(
+            z=all_states['TOTAL_SIZE'].to_numpy(),
+            locations=all_states['STATE'].to_numpy(),
+            hovertext=all_states['STATE_NAME'].to_numpy()
+        )
+        st.plotly_chart(fig_map_size, use_container_width=True)
+
+    # Tableau récapitulatif (TOP 10 par taille)
+    st.subheader("Tableau Récapitulatif - Top 10 par taille")
+    # Libellés et arrondis appliqués à l'affichage par le navigateur, sans copie des données
+    st.dataframe(
+        state_stats[['STATE_NAME', 'COUNT', 'TOTAL_SIZE', 'AVG_SIZE']],
+        column_config={
+            'STATE_NAME': 'État',
+            'COUNT': st.column_config.NumberColumn('Nb Incendies'),
+            'TOTAL_SIZE': st.column_config.NumberColumn('Surface Totale (km²)', format='%.1f'),
+            'AVG_SIZE': st.column_config.NumberColumn('Taille Moyenne (km²)', format='%.2f')
+        },
+        use_container_width=True,
+        hide_index=True
+    )
+
+    # Analyse par Causes
+    st.subheader("Analyse par Causes")
+
+    cause_stats = aggregates['cause_counts']
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig_causes = px.pie(
+            values=cause_stats.values,
+            names=cause_stats.index,
+            title="Causes principales d'incendies"
+        )
+        st.plotly_chart(fig_causes, use_container_width=True, config=STATIC_PLOT_CONFIG)
+
+    with col2:
+        fig_causes_bar = px.bar(
+            x=cause_stats.values,
+            y=cause_stats.index,
+            orientation='h',
+            title="Détail par cause",
+            color=cause_stats.values,
+            color_continuous_scale='Blues'
+        )
+        st.plotly_chart(fig_causes_bar, use_container_width=True)
+
+    # Heatmap temporelle
+    st.subheader("Heatmap Temporelle")
+
+    # Heatmap mois vs années
+    heatmap_data = aggregates['heatmap']
+
+    fig_heatmap = px.imshow(
+        heatmap_data.T,
+        title="Intensité des incendies (Mois vs Années)",
+        color_continuous_scale='Reds',
+        aspect="auto"
+    )
+    fig_heatmap.update_layout(
+        xaxis_title="Années",
+        yaxis_title="Mois"
+    )
+
+    st.plotly_chart(fig_heatmap, use_container_width=True, config=STATIC_PLOT_CONFIG)
+
+    # Insights et Recommandations
+    st.markdown("---")
+    st.subheader("Indicateurs clés et recommandations")
+
+    insights_col1, insights_col2 = st.columns(2)
+
+    with insights_col1:
+        st.info("**Indicateurs**")
+        peak_season = aggregates['seasonal_counts'].index[0]
+        st.write(f"• Saison critique: **{peak_season}**")
+
+        # Réutilise l'agrégat par état déjà calculé pour les cartes
+        state_agg = aggregates['state_agg']
+        top_row = state_agg.loc[state_agg['TOTAL_SIZE'].idxmax()]
+        top_state = top_row['STATE_NAME']
+        top_area = top_row['TOTAL_SIZE']
+            
+        st.write(f"• État le plus touché : **{top_state}** (Surface totale: {top_area:.2f} km²)")
+
+        top_cause = aggregates['cause_counts'].index[0]
+        st.write(f"• Cause principale: **{top_cause}**")
+
+    with insights_col2:
+        st.warning("**Recommandations**")
+        st.write("• Renforcer la surveillance des zones à risques pendant l'été")
+        st.write("• Cibler les efforts dans les états les plus touchés")
+        st.write("• Campagnes de prévention spécifiques aux causes principales")
+        st.write("• Optimiser les temps de réponse")
+
+
+# Tableaux du cube pré-agrégé, partagés sans copie entre les reruns
+# (les données brutes ne sont lues que pour l'aperçu)
+cube_arrays = load_cube_arrays()
+
+if cube_arrays['counts'].size:
     # SIDEBAR - Navigation
     st.sidebar.title("Navigation")
     st.sidebar.markdown("---")
@@ -62,402 +628,76 @@ if not df.empty:
     st.sidebar.markdown("---")
     st.sidebar.subheader("Filtres")
 
-    # Filtre par années
-    if 'FIRE_YEAR' in df.columns:
-        years = sorted(df['FIRE_YEAR'].unique())
-        selected_years = st.sidebar.multiselect(
-            "Années :",
-            years,
-            default=years[-5:] if len(years) > 5 else years
-        )
-        df_filtered = df[df['FIRE_YEAR'].isin(selected_years)] if selected_years else df
-    else:
-        df_filtered = df
-        selected_years = []
-
-    # Filtre par états
-    if 'STATE_NAME' in df.columns and not df['STATE_NAME'].empty:
-        states = sorted([state for state in df['STATE_NAME'].unique() if pd.notna(state)])
-        selected_states = st.sidebar.multiselect(
-            "États :",
-            states,
-            default=states[:10] if len(states) > 10 else states
-        )
+    filter_options = load_filter_options()
+
+    # Formulaire : les changements de filtres ne relancent le script qu'à la validation
+    with st.sidebar.form("filtres"):
+        # Filtre par années
+        if 'FIRE_YEAR' in filter_options:
+            years = filter_options['FIRE_YEAR']
+            selected_years = st.multiselect(
+                "Années :",
+                years,
+                default=years[-5:] if len(years) > 5 else years
+            )
+        else:
+            selected_years = []
+
+        # Filtre par états
+        if 'STATE_NAME' in filter_options:
+            states = filter_options['STATE_NAME']
+            selected_states = st.multiselect(
+                "États :",
+                states,
+                default=states[:10] if len(states) > 10 else states
+            )
+        else:
+            selected_states = []
+
+        # Filtre par saisons
+        if 'DISCOVERY_SEASON' in filter_options:
+            seasons = filter_options['DISCOVERY_SEASON']
+            selected_seasons = st.multiselect(
+                "Saisons :",
+                seasons,
+                default=seasons  # Par défaut, toutes les saisons sont sélectionnées
+            )
+        else:
+            selected_seasons = []
 
-        if selected_states:
-            df_filtered = df_filtered[df_filtered['STATE_NAME'].isin(selected_states)]
+        st.form_submit_button("Appliquer les filtres")
 
-    # Filtre par saisons
-    if 'DISCOVERY_SEASON' in df.columns:
-        seasons = sorted(df['DISCOVERY_SEASON'].unique())
-        selected_seasons = st.sidebar.multiselect(
-            "Saisons :",
-            seasons,
-            default=seasons  # Par défaut, toutes les saisons sont sélectionnées
-        )
+    # Application des filtres en un seul masque ; les sélections sont triées pour qu'un même
+    # ensemble de valeurs, quel que soit l'ordre de saisie, réutilise la même entrée du cache
+    selections = {
+        'FIRE_YEAR': tuple(sorted(selected_years)),
+        'STATE_NAME': tuple(sorted(selected_states)),
+        'DISCOVERY_SEASON': tuple(sorted(selected_seasons))
+    }
 
-        if selected_seasons:
-            df_filtered = df_filtered[df_filtered['DISCOVERY_SEASON'].isin(selected_seasons)]
+    # Agrégats de la sélection courante, gardés dans la session : un changement de page
+    # sans changement de filtres les réutilise sans relire le cache
+    selection_key = tuple(selections.values())
+    if st.session_state.get('aggregates_key') != selection_key:
+        st.session_state['aggregates'] = compute_aggregates(*selection_key)
+        st.session_state['aggregates_key'] = selection_key
+    aggregates = st.session_state['aggregates']
 
     # Informations dans la sidebar
     st.sidebar.markdown("---")
     st.sidebar.markdown("**Données actuelles **")
-    st.sidebar.info(f"{len(df_filtered):,} feux sélectionnées")
+    st.sidebar.info(f"{aggregates['kpis']['total_fires']:,} feux sélectionnées")
     if selected_years:
         st.sidebar.info(f"{len(selected_years)} années sélectionnées")
-    st.sidebar.info(f"Dataset complet : {len(df):,} feux")
+    st.sidebar.info(f"Dataset complet : {cube_arrays['total_fires']:,} feux")
 
-    # PAGE 1: APERÇU DES DONNÉES
+    # Affichage de la page sélectionnée
     if page == "Aperçu des données":
-        st.header("Aperçu des Données")
-
-        # KPIs principaux
-        col1, col2, col3, col4 = st.columns(4)
-
-        with col1:
-            total_fires = len(df_filtered)
-            st.metric(
-                label="Total Incendies",
-                value=f"{total_fires:,}",
-                delta=None
-            )
-
-        with col2:
-            avg_duration = df_filtered['DURATION_DAYS'].mean() if 'DURATION_DAYS' in df_filtered.columns else 0
-            st.metric(
-                label="Durée Moyenne",
-                value=f"{avg_duration:.1f} jours" if pd.notna(avg_duration) else "N/A"
-            )
-
-        with col3:
-            # Surface totale directement depuis FIRE_SIZE_KM2
-            if 'FIRE_SIZE_KM2' in df_filtered.columns:
-                total_area_km2 = df_filtered['FIRE_SIZE_KM2'].sum()
-                st.metric(
-                    label="Surface Totale",
-                    value=f"{total_area_km2:.2f} km²" if total_area_km2 > 0 else "N/A"
-                )
-            else:
-                st.metric(label="Surface Totale", value="N/A")
-
-        with col4:
-            # Taille moyenne directement depuis FIRE_SIZE_KM2
-            if 'FIRE_SIZE_KM2' in df_filtered.columns:
-                avg_size_km2 = df_filtered['FIRE_SIZE_KM2'].mean()
-                st.metric(
-                    label="Taille Moyenne",
-                    value=f"{avg_size_km2:.2f} km²" if avg_size_km2 > 0 else "N/A"
-                )
-            else:
-                st.metric(label="Taille Moyenne", value="N/A")
-
-        st.markdown("---")
-
-        # Tableau de données
-        st.subheader("Données Brutes")
-
-        # Options d'affichage
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            nb_rows = st.selectbox("Nombre de lignes :", [10, 25, 50, 100])
-
-        st.dataframe(df_filtered.head(nb_rows), use_container_width=True)
-
-        # Informations techniques
-        st.subheader("Informations Techniques")
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.write("**Colonnes disponibles :**")
-            st.write(list(df_filtered.columns))
-
-        with col2:
-            st.write("**Types de données :**")
-            st.write(dict(df_filtered.dtypes))
-
-    # PAGE 2: ANALYSE TEMPORELLE
+        page_overview(selections, aggregates)
     elif page == "Analyse temporelle":
-        st.header("Analyse Temporelle")
-
-        # Évolution annuelle
-        if 'FIRE_YEAR' in df_filtered.columns:
-            st.subheader("Évolution Annuelle")
-
-            yearly_stats = df_filtered.groupby('FIRE_YEAR').agg({
-                'FIRE_NAME': 'count',
-                'DURATION_DAYS': 'mean',
-                'FIRE_SIZE_KM2': ['mean', 'sum'] if 'FIRE_SIZE_KM2' in df_filtered.columns else None
-            }).reset_index()
-
-            # Graphique avec Plotly
-            fig = make_subplots(
-                rows=2, cols=2,
-                subplot_titles=('Nombre d\'incendies', 'Durée moyenne (jours)',
-                               'Taille moyenne (km²)', 'Surface totale (km²)'),
-            )
-
-            # Nombre d'incendies
-            fig.add_trace(
-                go.Scatter(
-                    x=yearly_stats['FIRE_YEAR'],
-                    y=yearly_stats['FIRE_NAME']['count'],
-                    mode='lines+markers',
-                    name='Nb incendies',
-                    line=dict(color='red', width=3)
-                ),
-                row=1, col=1
-            )
-
-            # Durée moyenne
-            if 'DURATION_DAYS' in yearly_stats.columns:
-                fig.add_trace(
-                    go.Scatter(
-                        x=yearly_stats['FIRE_YEAR'],
-                        y=yearly_stats['DURATION_DAYS']['mean'],
-                        mode='lines+markers',
-                        name='Durée moyenne',
-                        line=dict(color='blue', width=3)
-                    ),
-                    row=1, col=2
-                )
-
-            # Taille moyenne
-            if 'FIRE_SIZE_KM2' in yearly_stats.columns:
-                avg_values = yearly_stats['FIRE_SIZE_KM2']['mean']
-                fig.add_trace(
-                    go.Scatter(
-                        x=yearly_stats['FIRE_YEAR'],
-                        y=avg_values,
-                        mode='lines+markers',
-                        name='Taille moyenne (km²)',
-                        line=dict(color='green', width=3)
-                    ),
-                    row=2, col=1
-                )
-
-                # Surface totale
-                total_values = yearly_stats['FIRE_SIZE_KM2']['sum']
-                fig.add_trace(
-                    go.Scatter(
-                        x=yearly_stats['FIRE_YEAR'],
-                        y=total_values,
-                        mode='lines+markers',
-                        name='Surface totale (km²)',
-                        line=dict(color='orange', width=3)
-                    ),
-                    row=2, col=2
-                )
-
-            fig.update_layout(height=700, title_text="Tendances Annuelles")
-            st.plotly_chart(fig, use_container_width=True)
-
-        # Analyse saisonnière
-        if 'DISCOVERY_SEASON' in df_filtered.columns:
-            st.subheader("Analyse Saisonnière")
-
-            col1, col2 = st.columns(2)
-
-            with col1:
-                seasonal_stats = df_filtered['DISCOVERY_SEASON'].value_counts()
-                fig_pie = px.pie(
-                    values=seasonal_stats.values,
-                    names=seasonal_stats.index,
-                    title="Répartition par Saison",
-                    color_discrete_sequence=px.colors.sequential.RdBu
-                )
-                st.plotly_chart(fig_pie, use_container_width=True)
-
-            with col2:
-                fig_bar = px.bar(
-                    x=seasonal_stats.index,
-                    y=seasonal_stats.values,
-                    title="Nombre d'incendies par saison",
-                    color=seasonal_stats.values,
-                    color_continuous_scale='Reds'
-                )
-                st.plotly_chart(fig_bar, use_container_width=True)
-
-        # Analyse mensuelle
-        if 'MONTH' in df_filtered.columns:
-            st.subheader("Analyse Mensuelle")
-
-            monthly_stats = df_filtered['MONTH'].value_counts().sort_index()
-
-            fig_line = px.line(
-                x=monthly_stats.index,
-                y=monthly_stats.values,
-                title="Evolution mensuelle des incendies",
-                markers=True
-            )
-            fig_line.update_traces(line_color='orange', line_width=3)
-            fig_line.update_layout(xaxis_title="Mois", yaxis_title="Nombre d'incendies")
-            st.plotly_chart(fig_line, use_container_width=True)
-
-    # PAGE 3: VISUALISATIONS BI
+        page_temporal(selections, aggregates)
     elif page == "Visualisations BI":
-        st.header("Visualisations Business Intelligence")
-        
-        # Analyse par États
-        if 'STATE_NAME' in df_filtered.columns:
-            st.subheader("Analyse Géographique")
-
-            if 'FIRE_SIZE_KM2' in df_filtered.columns:
-                # TOUS les états pour les cartes
-                all_states = df_filtered.groupby(['STATE','STATE_NAME']).agg({
-                    'FIRE_NAME': 'count',
-                    'FIRE_SIZE_KM2': 'sum'
-                }).reset_index()
-                all_states.columns = ['STATE','STATE_NAME', 'COUNT', 'TOTAL_SIZE']
-                all_states['AVG_SIZE'] = all_states['TOTAL_SIZE'] / all_states['COUNT']
-                
-                # TOP 10 pour les graphiques en barres
-                state_stats = all_states.sort_values('COUNT', ascending=False).head(10)
-
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    fig_states = px.bar(
-                        state_stats,
-                        x='COUNT',
-                        y='STATE_NAME',
-                        orientation='h',
-                        title="Top 10 États - Nombre d'incendies",
-                        color='COUNT',
-                        color_continuous_scale='Reds'
-                    )
-                    st.plotly_chart(fig_states, use_container_width=True)
-
-                state_stats = all_states.sort_values('TOTAL_SIZE', ascending=False).head(10)
-                with col2:
-                    fig_size = px.bar(
-                        state_stats,
-                        x='TOTAL_SIZE',
-                        y='STATE_NAME',
-                        orientation='h',
-                        title="Surface brûlée par État (km²)",
-                        color='TOTAL_SIZE',
-                        color_continuous_scale='Oranges'
-                    )
-                    fig_size.update_layout(xaxis_title="Surface totale (km²)")
-                    st.plotly_chart(fig_size, use_container_width=True)
-
-                # Carte choroplèthe avec TOUS les états
-                st.subheader("Cartes des incendies par État")
-                
-                col3, col4 = st.columns(2)
-                
-                with col3:
-                    fig_map_count = px.choropleth(
-                        all_states, 
-                        locations="STATE",
-                        locationmode="USA-states",
-                        color="COUNT",
-                        scope="usa",
-                        color_continuous_scale="Reds",
-                        title="Nombre d'incendies par État",
-                        labels={"COUNT": "Nombre d'incendies"},
-                        hover_name="STATE_NAME"
-                    )
-                    st.plotly_chart(fig_map_count, use_container_width=True)
-
-                with col4:
-                    fig_map_size = px.choropleth(
-                        all_states,
-                        locations="STATE",
-                        locationmode="USA-states",
-                        color="TOTAL_SIZE",
-                        scope="usa",
-                        color_continuous_scale="Oranges",
-                        title="Surface brûlée par État (km²)",
-                        labels={"TOTAL_SIZE": "Surface (km²)"},
-                        hover_name="STATE_NAME"
-                    )
-                    st.plotly_chart(fig_map_size, use_container_width=True)
-
-                # Tableau récapitulatif (TOP 10 par taille)
-                st.subheader("Tableau Récapitulatif - Top 10 par taille")
-                display_stats = state_stats[['STATE_NAME', 'COUNT', 'TOTAL_SIZE', 'AVG_SIZE']].copy()
-                display_stats.columns = ['État', 'Nb Incendies', 'Surface Totale (km²)', 'Taille Moyenne (km²)']
-                display_stats['Surface Totale (km²)'] = display_stats['Surface Totale (km²)'].round(1)
-                display_stats['Taille Moyenne (km²)'] = display_stats['Taille Moyenne (km²)'].round(2)
-                
-                st.dataframe(display_stats, use_container_width=True, hide_index=True)
-
-        # Analyse par Causes
-        if 'STAT_CAUSE_DESCR' in df_filtered.columns:
-            st.subheader("Analyse par Causes")
-
-            cause_stats = df_filtered['STAT_CAUSE_DESCR'].value_counts().head(8)
-
-            col1, col2 = st.columns(2)
-
-            with col1:
-                fig_causes = px.pie(
-                    values=cause_stats.values,
-                    names=cause_stats.index,
-                    title="Causes principales d'incendies"
-                )
-                st.plotly_chart(fig_causes, use_container_width=True)
-
-            with col2:
-                fig_causes_bar = px.bar(
-                    x=cause_stats.values,
-                    y=cause_stats.index,
-                    orientation='h',
-                    title="Détail par cause",
-                    color=cause_stats.values,
-                    color_continuous_scale='Blues'
-                )
-                st.plotly_chart(fig_causes_bar, use_container_width=True)
-
-        # Heatmap temporelle
-        if 'MONTH' in df_filtered.columns and 'FIRE_YEAR' in df_filtered.columns:
-            st.subheader("Heatmap Temporelle")
-
-            # Création d'une heatmap mois vs années
-            heatmap_data = df_filtered.groupby(['FIRE_YEAR', 'MONTH']).size().unstack(fill_value=0)
-
-            fig_heatmap = px.imshow(
-                heatmap_data.T,
-                title="Intensité des incendies (Mois vs Années)",
-                color_continuous_scale='Reds',
-                aspect="auto"
-            )
-            fig_heatmap.update_layout(
-                xaxis_title="Années",
-                yaxis_title="Mois"
-            )
-
-            st.plotly_chart(fig_heatmap, use_container_width=True)
-
-        # Insights et Recommandations
-        st.markdown("---")
-        st.subheader("Indicateurs clés et recommandations")
-
-        insights_col1, insights_col2 = st.columns(2)
-
-        with insights_col1:
-            st.info("**Indicateurs**")
-            if 'DISCOVERY_SEASON' in df_filtered.columns:
-                peak_season = df_filtered['DISCOVERY_SEASON'].value_counts().index[0]
-                st.write(f"• Saison critique: **{peak_season}**")
-
-            if 'FIRE_SIZE_KM2' in df_filtered.columns and "STATE_NAME" in df_filtered.columns:
-                top_state = df_filtered.groupby('STATE_NAME')['FIRE_SIZE_KM2'].sum().idxmax()
-                top_area = df_filtered.groupby('STATE_NAME')['FIRE_SIZE_KM2'].sum().max()
-                
-                st.write(f"• État le plus touché : **{top_state}** (Surface totale: {top_area:.2f} km²)")
-
-            if 'STAT_CAUSE_DESCR' in df_filtered.columns:
-                top_cause = df_filtered['STAT_CAUSE_DESCR'].value_counts().index[0]
-                st.write(f"• Cause principale: **{top_cause}**")
-
-        with insights_col2:
-            st.warning("**Recommandations**")
-            st.write("• Renforcer la surveillance des zones à risques pendant l'été")
-            st.write("• Cibler les efforts dans les états les plus touchés")
-            st.write("• Campagnes de prévention spécifiques aux causes principales")
-            st.write("• Optimiser les temps de réponse")
+        page_bi(aggregates)
 
 
 # Pied de page
@@ -0,0 +1,16 @@
+# preprocess.py
+# Génère les fichiers Parquet prétraités lus par le dashboard.
+# A relancer après toute modification du CSV : python preprocess.py
+from utils.preprocessing import load_state_names, build_dataframe, build_cube, write_parquet, parquet_path, cube_path
+
+# Traitement complet du CSV brut
+df = build_dataframe(load_state_names())
+
+# Sauvegarde en Parquet compressé zstd (catégories et types réduits conservés)
+write_parquet(df, parquet_path)
+print(f"{len(df):,} lignes écrites dans {parquet_path}")
+
+# Cube pré-agrégé (année, état, saison, mois, cause) utilisé par toutes les pages
+cube = build_cube(df)
+write_parquet(cube.reset_index(), cube_path)
+print(f"{len(cube):,} cellules écrites dans {cube_path}")
@@ -0,0 +1,75 @@
+# agg_numba.py
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+
+@njit(parallel=True, cache=True)
+def _state_sum_count(state_code, count, size, mask, n_states, n_threads):
+    n = len(size)
+    chunk = (n + n_threads - 1) // n_threads
+
+    # Accumulateurs locaux à chaque thread pour éviter les conflits d'écriture
+    cnt = np.zeros((n_threads, n_states), np.int64)
+    tot = np.zeros((n_threads, n_states), np.float64)
+    for t in prange(n_threads):
+        for i in range(t * chunk, min(n, (t + 1) * chunk)):
+            s = state_code[i]
+            if mask[i] and s >= 0:
+                cnt[t, s] += count[i]
+                tot[t, s] += size[i]
+
+    return cnt.sum(axis=0), tot.sum(axis=0)
+
+
+def state_sum_count(state_code, count, size, mask, n_states):
+    """Somme par état des incendies et des surfaces sur les lignes sélectionnées par le masque"""
+    return _state_sum_count(state_code, count, size, mask, n_states, get_num_threads())
+
+
+@njit(parallel=True, cache=True)
+def _year_sums(year_code, count, size, n_size, duration, n_duration, mask, n_years, n_threads):
+    n = len(count)
+    chunk = (n + n_threads - 1) // n_threads
+
+    # Cinq sommes par année accumulées dans la même passe, par thread
+    sums = np.zeros((n_threads, 5, n_years), np.float64)
+    for t in prange(n_threads):
+        for i in range(t * chunk, min(n, (t + 1) * chunk)):
+            y = year_code[i]
+            if mask[i] and y >= 0:
+                sums[t, 0, y] += count[i]
+                sums[t, 1, y] += size[i]
+                sums[t, 2, y] += n_size[i]
+                sums[t, 3, y] += duration[i]
+                sums[t, 4, y] += n_duration[i]
+
+    total = sums.sum(axis=0)
+    return total[0], total[1], total[2], total[3], total[4]
+
+
+def year_sums(year_code, count, size, n_size, duration, n_duration, mask, n_years):
+    """Sommes par année des incendies, surfaces, surfaces renseignées, durées et durées renseignées sur les lignes sélectionnées"""
+    return _year_sums(year_code, count, size, n_size, duration, n_duration, mask, n_years, get_num_threads())
+
+
+@njit(parallel=True, cache=True)
+def _year_month_counts(year_code, month_idx, count, mask, n_years, n_threads):
+    n = len(count)
+    chunk = (n + n_threads - 1) // n_threads
+
+    # Une matrice (années x mois) par thread, sommées à la fin
+    heatmap = np.zeros((n_threads, n_years, 12), np.int64)
+    for t in prange(n_threads):
+        for i in range(t * chunk, min(n, (t + 1) * chunk)):
+            y = year_code[i]
+            m = month_idx[i]
+            if mask[i] and y >= 0 and m >= 0:
+                heatmap[t, y, m] += count[i]
+
+    return heatmap.sum(axis=0)
+
+
+def year_month_counts(year_code, month_idx, count, mask, n_years):
+    """Nombre d'incendies par année et par mois (0 à 11, -1 si inconnu) sur les lignes sélectionnées"""
+    return _year_month_counts(year_code, month_idx, count, mask, n_years, get_num_threads())
+
@@ -1,78 +1,222 @@
 # preprocessing.py
+import logging
+import os
+import tempfile
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import Dict, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
 
 file_path = 'data/fires_light_gh.csv'
+# Fichiers prétraités générés par preprocess.py
+parquet_path = 'data/fires.parquet'
+cube_path = 'data/fires_cube.parquet'
+
+# Colonnes lues dans le CSV brut et leurs types
+RAW_COLUMNS = [
+    'OBJECTID', 'FIRE_YEAR', 'STAT_CAUSE_DESCR', 'FIRE_SIZE', 'STATE',
+    'DATEGREG_DISCOVERY', 'DATEGREG_CONT', 'FIRE_NAME'
+]
+RAW_DTYPES = {
+    'OBJECTID': 'int32',
+    'FIRE_YEAR': 'int16',
+    'FIRE_SIZE': 'float32',
+    'STATE': 'category',
+    'STAT_CAUSE_DESCR': 'category'
+}
+
+# Colonnes utilisées par le dashboard (lecture du Parquet)
+USED_COLUMNS = [
+    'OBJECTID', 'FIRE_YEAR', 'MONTH', 'STATE', 'STATE_NAME', 'DISCOVERY_SEASON',
+    'FIRE_SIZE_KM2', 'DURATION_DAYS', 'FIRE_NAME', 'STAT_CAUSE_DESCR',
+    'DATEGREG_DISCOVERY', 'DATEGREG_CONT', 'DAY', 'DAY_OF_WEEK'
+]
+
+# Colonnes de filtre et de regroupement stockées en catégories
+CATEGORY_COLUMNS = ['FIRE_YEAR', 'STATE', 'STATE_NAME', 'DISCOVERY_SEASON', 'MONTH', 'STAT_CAUSE_DESCR']
+
+# 1 acre = 0.00404686 km²
+ACRE_TO_KM2 = np.float32(0.00404686)
+
+# Saisons, et code de saison pour chaque mois (indice 0 : mois inconnu)
+SEASONS = ['Winter', 'Spring', 'Summer', 'Fall']
+SEASON_CODES = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+
+# Clés de regroupement du cube pré-agrégé
+CUBE_KEYS = ['FIRE_YEAR', 'STATE', 'STATE_NAME', 'DISCOVERY_SEASON', 'MONTH', 'STAT_CAUSE_DESCR']
+# Colonnes du cube une fois écrit en Parquet (clés puis agrégats)
+CUBE_COLUMNS = CUBE_KEYS + ['count', 'sum_size', 'n_size', 'sum_duration', 'n_duration']
 
 def load_state_names() -> Dict[str, str]:
     """Charge la correspondance entre codes et noms d'états"""
-    state_df = pd.read_csv('data/state_names.csv')
-    return dict(zip(state_df['Alpha code'], state_df['State']))
+    return load_state_mappings()[0]
 
+@lru_cache(maxsize=1)
+def load_state_mappings() -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Correspondances code -> nom et nom -> code des états, lues une seule fois par processus"""
+    state_df = pd.read_csv('data/state_names.csv')
+    code_to_name = dict(zip(state_df['Alpha code'], state_df['State']))
+    return code_to_name, {v: k for k, v in code_to_name.items()}
 
-def calculate_duration(discovery_date, cont_date):
-    """Calcule la durée en jours entre découverte et contrôle"""
-    if pd.isna(discovery_date) or pd.isna(cont_date):
-        return None
-    return (cont_date - discovery_date).days
 
 def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     """Applique tous les traitements nécessaires aux données brutes"""
    
-    #Conversion acre km²
-    # 1 acre = 0.00404686 km²
-    df['FIRE_SIZE_KM2'] = df['FIRE_SIZE'] * 0.00404686
+    #Conversion acre km², directement en float32
     # Arrondir à 4 décimales pour une précision correcte
-    df['FIRE_SIZE_KM2'] = df['FIRE_SIZE_KM2'].round(4)
+    df['FIRE_SIZE_KM2'] = np.round(
+        df['FIRE_SIZE'].to_numpy(dtype=np.float32) * ACRE_TO_KM2, 4
+    )
+    # La surface en acres n'est plus utilisée : une seule colonne de surface est conservée
+    df = df.drop(columns='FIRE_SIZE')
 
     # Conversion des colonnes de date
-    df['DATEGREG_DISCOVERY'] = pd.to_datetime(df['DATEGREG_DISCOVERY'], errors='coerce')
-    df['DATEGREG_CONT'] = pd.to_datetime(df['DATEGREG_CONT'], errors='coerce')
+    for col in ['DATEGREG_DISCOVERY', 'DATEGREG_CONT']:
+        # Inutile si le moteur PyArrow a déjà lu la colonne en dates ; sinon
+        # format ISO8601 : accepte aussi une partie horaire, sans perte de données
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce', cache=True)
     
-    # Calcul de la durée des incendies
+    # Calcul de la durée des incendies (jours entiers écoulés)
     if all(col in df.columns for col in ['DATEGREG_DISCOVERY', 'DATEGREG_CONT']):
-        df['DURATION_DAYS'] = df.apply(
-            lambda row: calculate_duration(row['DATEGREG_DISCOVERY'], row['DATEGREG_CONT']),
-            axis=1
-        )
+        duration = (df['DATEGREG_CONT'] - df['DATEGREG_DISCOVERY']).dt.days
         # Nettoyage des valeurs aberrantes (durées négatives ou trop longues)
-        df.loc[df['DURATION_DAYS'] < 0, 'DURATION_DAYS'] = None
-        df.loc[df['DURATION_DAYS'] > 365, 'DURATION_DAYS'] = None
+        df['DURATION_DAYS'] = duration.where((duration >= 0) & (duration <= 365))
 
     # Extraction des informations temporelles
     if 'DATEGREG_DISCOVERY' in df.columns:
-        df['MONTH'] = df['DATEGREG_DISCOVERY'].dt.month
-        df['DAY'] = df['DATEGREG_DISCOVERY'].dt.day
-        df['DAY_OF_WEEK'] = df['DATEGREG_DISCOVERY'].dt.dayofweek
+        # Petits entiers nullables (les dates manquantes donnent <NA>)
+        df['MONTH'] = df['DATEGREG_DISCOVERY'].dt.month.astype('Int8')
+        df['DAY'] = df['DATEGREG_DISCOVERY'].dt.day.astype('Int8')
+        df['DAY_OF_WEEK'] = df['DATEGREG_DISCOVERY'].dt.dayofweek.astype('Int8')
         
-        # Classification par saisons
-        df['DISCOVERY_SEASON'] = df['MONTH'].map({
-            12: 'Winter', 1: 'Winter', 2: 'Winter',
-            3: 'Spring', 4: 'Spring', 5: 'Spring',
-            6: 'Summer', 7: 'Summer', 8: 'Summer',
-            9: 'Fall', 10: 'Fall', 11: 'Fall'
-        })
+        # Classification par saisons : code de saison indexé par le numéro du mois (0 = date manquante)
+        month_idx = df['MONTH'].fillna(0).to_numpy(dtype=np.int64)
+        df['DISCOVERY_SEASON'] = pd.Categorical.from_codes(
+            SEASON_CODES[month_idx], categories=SEASONS
+        )
+
+    if 'FIRE_YEAR' in df.columns:
+        df['FIRE_YEAR'] = pd.to_numeric(df['FIRE_YEAR'], downcast='integer')
+
+    # Colonnes de filtre et de regroupement en catégories (codes entiers)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
 
     return df
 
-def load_and_preprocess_data() -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
-    """Fonction principale qui charge et traite toutes les données"""
-    
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Pré-agrège les incendies par année, état, saison, mois et cause"""
+    cube = df.groupby(
+        CUBE_KEYS,
+        observed=True,
+        dropna=False,
+        # L'ordre des cellules n'a pas d'importance : tout est relu par codes de catégories
+        sort=False
+    ).agg(
+        count=('FIRE_NAME', 'size'),
+        sum_size=('FIRE_SIZE_KM2', 'sum'),
+        # Nombre de surfaces renseignées, pour une moyenne qui ignore les NaN
+        n_size=('FIRE_SIZE_KM2', 'count'),
+        sum_duration=('DURATION_DAYS', 'sum'),
+        # Nombre de durées renseignées, pour une moyenne qui ignore les NaN
+        n_duration=('DURATION_DAYS', 'count')
+    )
+    # Compteurs réduits au plus petit type entier (les sommes sont accumulées en 64 bits ensuite)
+    for col in ['count', 'n_size', 'n_duration']:
+        cube[col] = pd.to_numeric(cube[col], downcast='integer')
+    return cube
+
+def load_cube() -> pd.DataFrame:
+    """Charge le cube pré-agrégé écrit par preprocess.py"""
+    cube = pd.read_parquet(cube_path, engine='pyarrow')
+    for col in CUBE_KEYS:
+        cube[col] = cube[col].astype('category')
+    return cube.set_index(CUBE_KEYS)
+
+def is_up_to_date(path: str, columns: List[str]) -> bool:
+    """Vérifie qu'un fichier prétraité existe, est au moins aussi récent que le CSV
+    et contient toutes les colonnes attendues (sinon il est régénéré)"""
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(file_path):
+        return False
+    try:
+        names = pq.read_schema(path).names
+    except (OSError, pa.ArrowException):
+        return False
+    return set(columns).issubset(names)
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    """Écrit un fichier prétraité via un fichier temporaire renommé ensuite :
+    une écriture interrompue ne laisse jamais de Parquet tronqué à la place de l'ancien"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        # mkstemp crée le fichier en 0600 : droits usuels (selon l'umask) pour que
+        # le dashboard puisse le lire même s'il tourne sous un autre utilisateur
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_parquet(df: pd.DataFrame, path: str) -> None:
+    """Met en cache un fichier prétraité ; un échec (dossier en lecture seule, erreur de sérialisation) est journalisé sans interrompre le dashboard"""
+    try:
+        write_parquet(df, path)
+    except (OSError, pa.ArrowException) as err:
+        logger.warning("Cache Parquet non écrit (%s) : %s", path, err)
+
+def build_dataframe(code_to_name: Dict[str, str]) -> pd.DataFrame:
+    """Charge le CSV brut et applique tous les traitements"""
+
     # Chargement des données principales
-    df = pd.read_csv(file_path)
-    
-    # Chargement de la correspondance des états
-    state_mapping = load_state_names()
-    code_to_name = state_mapping
-    name_to_code = {v: k for k, v in state_mapping.items()}
-    
+    # Moteur PyArrow : lecture multithread, limitée aux colonnes utiles et typée d'emblée
+    df = pd.read_csv(file_path, engine='pyarrow', usecols=RAW_COLUMNS, dtype=RAW_DTYPES)
+
     # Ajout des noms d'états complets
     if 'STATE' in df.columns and code_to_name:
         df['STATE_NAME'] = df['STATE'].map(code_to_name)
         df['STATE_NAME'] = df['STATE_NAME'].fillna(df['STATE'])
-    
+
     # Application de tous les traitements
     df = preprocess_data(df)
+
+    # Réduction des types numériques (float32 / petits entiers)
+    if 'DURATION_DAYS' in df.columns:
+        df['DURATION_DAYS'] = pd.to_numeric(df['DURATION_DAYS'], downcast='float')
+    if 'OBJECTID' in df.columns:
+        df['OBJECTID'] = pd.to_numeric(df['OBJECTID'], downcast='integer')
+
+    # Tri par année : chaque année occupe une plage contiguë de lignes
+    df = df.sort_values('FIRE_YEAR', kind='stable', ignore_index=True)
+
+    return df
+
+def load_and_preprocess_data() -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
+    """Fonction principale qui charge et traite toutes les données"""
+    
+    # Chargement de la correspondance des états
+    code_to_name, name_to_code = load_state_mappings()
+
+    # Lecture du Parquet prétraité s'il est à jour, sinon traitement du CSV
+    if is_up_to_date(parquet_path, USED_COLUMNS):
+        df = pd.read_parquet(parquet_path, columns=USED_COLUMNS, engine='pyarrow')
+        # Les catégories numériques (années, mois) ne sont pas conservées par Parquet
+        for col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+    else:
+        df = build_dataframe(code_to_name)
+        # Mise en cache disque : les démarrages suivants liront directement le Parquet
+        save_parquet(df, parquet_path)
+        # Même schéma que la lecture du Parquet
+        df = df[USED_COLUMNS]
     
     return df, code_to_name, name_to_code
@@ -1,19 +1,22 @@
-import pandas as pd
+import numpy as np
+import pyarrow.dataset as ds
 
-# Lire le fichier CSV
+# Lire le fichier CSV (parcours par blocs avec PyArrow, sans le charger entièrement)
 file_path = 'fires_light.csv'  # Remplacez par le chemin de votre fichier
-df = pd.read_csv(file_path)
-
-# Filtre sur 20ans
-df = df[df['FIRE_YEAR'] > 1994]  
+dataset = ds.dataset(file_path, format='csv')
 
 # Optionnel : retirer les colonnes moins importantes
 columns_to_keep = ["OBJECTID","FIRE_YEAR","STAT_CAUSE_DESCR","FIRE_SIZE","STATE","DATEGREG_DISCOVERY","DATEGREG_CONT","FIRE_NAME"]
 
-# Échantillonnage : Garder environ 50% des données pour réduire à 20 Mo
-df_sampled = df.sample(frac=0.5, random_state=1)
+# Filtre sur 20ans, appliqué pendant le parcours (seules les lignes retenues sont comptées)
+year_filter = ds.field('FIRE_YEAR') > 1994
+n_rows = dataset.count_rows(filter=year_filter)
 
-df_reduced = df_sampled[columns_to_keep]
+# Échantillonnage : Garder environ 50% des données pour réduire à 20 Mo
+# (tirage des indices d'abord, seules les lignes échantillonnées sont chargées en mémoire)
+rng = np.random.default_rng(1)
+sample_idx = np.sort(rng.choice(n_rows, size=n_rows // 2, replace=False))
+df_reduced = dataset.take(sample_idx, columns=columns_to_keep, filter=year_filter).to_pandas()
 
 # Sauvegarder dans un nouveau fichier CSV
 output_file_path = 'fires_light_gh.csv'  # Remplacez par le chemin de destination souhaité